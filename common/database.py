@@ -1,17 +1,52 @@
 from collections.abc import Generator
 from contextlib import contextmanager
+from functools import lru_cache
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.default import DefaultDialect
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 Base = declarative_base()
 
 
+# Pool sizing for dialects that use QueuePool (e.g. PostgreSQL). Other pools
+# (SingletonThreadPool for in-memory SQLite, StaticPool, NullPool) reject
+# some of these arguments, so they are only applied to QueuePool.
+_QUEUE_POOL_DEFAULTS = {"pool_size": 10, "max_overflow": 20, "pool_recycle": 1800}
+
+
 class DatabaseManager:
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url, pool_pre_ping=True)
+    def __init__(
+        self,
+        database_url: str,
+        pool_size: int | None = None,
+        max_overflow: int | None = None,
+        pool_recycle: int | None = None,
+    ):
+        url = make_url(database_url)
+        dialect = url.get_dialect()
+        pool_args: dict[str, int] = {}
+        if issubclass(dialect, DefaultDialect) and issubclass(
+            dialect.get_pool_class(url), QueuePool
+        ):
+            pool_args.update(_QUEUE_POOL_DEFAULTS)
+        # Explicit arguments are passed through as given.
+        for name, value in (
+            ("pool_size", pool_size),
+            ("max_overflow", max_overflow),
+            ("pool_recycle", pool_recycle),
+        ):
+            if value is not None:
+                pool_args[name] = value
+        self.engine = create_engine(url, pool_pre_ping=True, **pool_args)
+        # Committed objects stay loaded; no reload round-trip on next access.
         self.SessionLocal = sessionmaker(
-            autocommit=False, autoflush=False, bind=self.engine
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            bind=self.engine,
         )
 
     @contextmanager
@@ -26,6 +61,15 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @contextmanager
+    def read_session(self) -> Generator[Session, None, None]:
+        """Session for read-only work: no commit, closing ends the transaction."""
+        session = self.SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
     def get_db(self) -> Generator[Session, None, None]:
         session = self.SessionLocal()
         try:
@@ -34,8 +78,13 @@ class DatabaseManager:
             session.close()
 
 
+@lru_cache(maxsize=8)
+def _get_manager(database_url: str) -> DatabaseManager:
+    # Engines own their connection pool; build one per URL, not per call.
+    return DatabaseManager(database_url)
+
+
 # Keep get_db as a standalone for simpler cases if needed,
 # but DatabaseManager is the main interface.
 def get_db(database_url: str):
-    db_manager = DatabaseManager(database_url)
-    yield from db_manager.get_db()
+    yield from _get_manager(database_url).get_db()
@@ -1,94 +1,274 @@
+import asyncio
 import logging
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
 
 import httpx
 
 logger = logging.getLogger(__name__)
 
+_POOL_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+
+def _extract_embeddings(data: Any) -> list:
+    """Normalize any supported response shape to one vector per input text."""
+    # Fast path: {"embeddings": [[...], ...]} from the Lilith embedding service.
+    if type(data) is dict:
+        embeddings = data.get("embeddings")
+        if embeddings is not None:
+            return embeddings
+        items = data.get("data")
+        if isinstance(items, list):
+            # Some APIs return {"data": [{"embedding": [...]}]}
+            return [
+                d["embedding"] if isinstance(d, dict) and "embedding" in d else d
+                for d in items
+            ]
+        return []
+    if isinstance(data, list) and data:
+        # Either a list of vectors or a bare vector for a single text.
+        return data if isinstance(data[0], list) else [data]
+    return []
+
+
+def _release(pending: queue.Queue, client: httpx.Client) -> None:
+    """Finalizer for a collected Embedder: stop its worker, close its pool."""
+    pending.put(None)
+    client.close()
+
+
+def _batch_worker(ref: weakref.ref["Embedder"], pending: queue.Queue) -> None:
+    """Batching loop run by the Embedder's worker thread.
+
+    The Embedder is only referenced while a batch is being sent, so an idle
+    worker does not keep it (and its connection pool) alive.
+    """
+    while True:
+        first = pending.get()
+        if first is None:
+            return
+        embedder = ref()
+        if embedder is None:
+            if first[1].set_running_or_notify_cancel():
+                first[1].set_exception(RuntimeError("Embedder was garbage-collected"))
+            return
+        try:
+            stop = embedder._run_batch(first)
+        except Exception:
+            # Never let one bad batch end the loop; later callers would
+            # wait on their futures forever.
+            logger.exception("embedding batch failed")
+            stop = False
+        del embedder
+        if stop:
+            return
+
 
 class Embedder:
-    """Shared embedding service client."""
+    """Shared embedding service client.
+
+    HTTP clients are long-lived so repeated calls reuse pooled keep-alive
+    connections instead of reconnecting on every request. Single-text encodes
+    go through a background worker that sends whatever is queued, up to
+    ``max_batch`` texts, in one request. Texts queued while a request is in
+    flight form the next batch, so a lone call is sent immediately. A
+    ``max_wait_ms`` above 0 opts in to waiting that long for more texts
+    before sending, trading single-call latency for larger batches.
+    """
 
-    def __init__(self, endpoint_url: str, dim: int) -> None:
+    def __init__(
+        self,
+        endpoint_url: str,
+        dim: int,
+        max_batch: int = 32,
+        max_wait_ms: float = 0.0,
+    ) -> None:
         self.endpoint_url = endpoint_url
         self.dim = dim
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._client = httpx.Client(timeout=30.0, limits=_POOL_LIMITS)
+        self._aclient: httpx.AsyncClient | None = None
+        self._aclient_loop: asyncio.AbstractEventLoop | None = None
+        self._pending: queue.Queue[tuple[str, Future[list[float]]] | None] = (
+            queue.Queue()
+        )
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+        # Unlike atexit.register(self.close), this doesn't keep the Embedder
+        # alive; it runs when the Embedder is collected or at exit.
+        self._finalizer = weakref.finalize(self, _release, self._pending, self._client)
 
-    def encode_sync(self, text: str) -> list[float]:
-        """Synchronous wrapper for single text encoding."""
-        if not text or not text.strip():
-            return [0.0] * self.dim
+    def _get_aclient(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them, so each
+        # asyncio.run() needs its own client; reusing one from a closed loop
+        # fails with "Event loop is closed". No await between the check and
+        # the assignment, so this cannot race within a single loop.
+        loop = asyncio.get_running_loop()
+        if (
+            self._aclient is None
+            or self._aclient.is_closed
+            or self._aclient_loop is not loop
+        ):
+            self._aclient = httpx.AsyncClient(timeout=30.0, limits=_POOL_LIMITS)
+            self._aclient_loop = loop
+        return self._aclient
 
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                resp = client.post(self.endpoint_url, json={"texts": [text]})
-                resp.raise_for_status()
-                data = resp.json()
-
-                # Handle different common response formats
-                if isinstance(data, dict):
-                    if "embeddings" in data:
-                        return data["embeddings"][0]
-                    if "data" in data and isinstance(data["data"], list):
-                        # Some APIs return {"data": [{"embedding": [...]}]}
-                        first = data["data"][0]
-                        if isinstance(first, dict) and "embedding" in first:
-                            return first["embedding"]
-                        return first
-                if isinstance(data, list) and len(data) > 0:
-                    return data[0] if isinstance(data[0], list) else data
+    def close(self) -> None:
+        """Stop the batching worker and close the pooled synchronous client."""
+        self._finalizer.detach()
+        with self._worker_lock:
+            if self._worker is not None:
+                self._pending.put(None)
+                self._worker.join(timeout=1.0)
+                self._worker = None
+        self._client.close()
 
-                return [0.0] * self.dim
+    async def aclose(self) -> None:
+        """Close both pooled clients."""
+        if self._aclient is not None:
+            if self._aclient_loop is asyncio.get_running_loop():
+                await self._aclient.aclose()
+            self._aclient = None
+            self._aclient_loop = None
+        self.close()
+
+    def _submit(self, text: str) -> Future[list[float]]:
+        """Queue one text for the next coalesced request."""
+        fut: Future[list[float]] = Future()
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=_batch_worker,
+                    args=(weakref.ref(self), self._pending),
+                    name="embedder-batcher",
+                    daemon=True,
+                )
+                self._worker.start()
+        self._pending.put((text, fut))
+        return fut
+
+    def _run_batch(self, first: tuple[str, Future[list[float]]]) -> bool:
+        """Collect and send one batch; returns True if close() was requested."""
+        batch: list[tuple[str, Future[list[float]]]] = []
+        stop = False
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        nxt: tuple[str, Future[list[float]]] | None = first
+        while nxt is not None:
+            # Marks the future running, or reports that its caller already
+            # cancelled it (e.g. asyncio.wait_for timed out).
+            if nxt[1].set_running_or_notify_cancel():
+                batch.append(nxt)
+            if len(batch) >= self.max_batch:
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    nxt = self._pending.get(timeout=remaining)
+                else:
+                    nxt = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                stop = True
+        if batch:
+            try:
+                self._flush(batch)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                raise
+        return stop
+
+    def _flush(self, batch: list[tuple[str, Future[list[float]]]]) -> None:
+        texts = [text for text, _ in batch]
+        embeddings: list = []
+        try:
+            resp = self._client.post(
+                self.endpoint_url, json={"texts": texts}, timeout=10.0
+            )
+            resp.raise_for_status()
+            embeddings = _extract_embeddings(resp.json())
         except Exception as e:
             logger.error("encode_sync failed: %s", e)
+
+        # Results are matched to callers by position in the request.
+        for i, (_, fut) in enumerate(batch):
+            if i < len(embeddings):
+                fut.set_result(embeddings[i])
+            else:
+                fut.set_result([0.0] * self.dim)
+
+    def encode_sync(self, text: str) -> list[float]:
+        """Synchronous wrapper for single text encoding."""
+        if not text or not text.strip():
             return [0.0] * self.dim
+        return self._submit(text).result()
 
     async def encode(self, text: str | list[str]) -> list[float] | list[list[float]]:
         """Asynchronous encoding."""
-        texts = [text] if isinstance(text, str) else text
+        if isinstance(text, str):
+            if not text.strip():
+                return [0.0] * self.dim
+            return await asyncio.wrap_future(self._submit(text))
+
+        texts = text
         if not texts:
-            return [] if isinstance(text, list) else [0.0] * self.dim
+            return []
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                resp = await client.post(self.endpoint_url, json={"texts": texts})
-                resp.raise_for_status()
-                data = resp.json()
-
-                # Normalize response format
-                embeddings = []
-                if isinstance(data, dict) and "embeddings" in data:
-                    embeddings = data["embeddings"]
-                elif isinstance(data, list):
-                    embeddings = data
-
-                if isinstance(text, str):
-                    return embeddings[0] if embeddings else [0.0] * self.dim
-                return embeddings
+            resp = await self._get_aclient().post(
+                self.endpoint_url, json={"texts": texts}, timeout=10.0
+            )
+            resp.raise_for_status()
+            return _extract_embeddings(resp.json())
         except Exception as e:
             logger.error("encode failed: %s", e)
-            if isinstance(text, str):
-                return [0.0] * self.dim
             return [[0.0] * self.dim] * len(texts)
 
     def encode_batch(
-        self, texts: list[str], batch_size: int = 4, **kwargs
+        self,
+        texts: list[str],
+        batch_size: int = 4,
+        max_inflight: int = 4,
+        **kwargs,
     ) -> list[list[float]]:
-        """Synchronous batch encoding."""
+        """Synchronous batch encoding.
+
+        Up to ``max_inflight`` batches are posted concurrently over the pooled
+        client; results keep the input order.
+        """
         if not texts:
             return []
 
+        starts = range(0, len(texts), batch_size)
+        workers = max(1, min(max_inflight, len(starts)))
+        if workers == 1:
+            batches = [self._post_batch(i, texts[i : i + batch_size]) for i in starts]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                batches = list(
+                    pool.map(
+                        lambda i: self._post_batch(i, texts[i : i + batch_size]),
+                        starts,
+                    )
+                )
+
         results = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            try:
-                with httpx.Client(timeout=30.0) as client:
-                    resp = client.post(self.endpoint_url, json={"texts": batch})
-                    resp.raise_for_status()
-                    data = resp.json()
-                    if isinstance(data, dict) and "embeddings" in data:
-                        results.extend(data["embeddings"])
-                    elif isinstance(data, list):
-                        results.extend(data)
-            except Exception as e:
-                logger.error("encode_batch failed for batch %d: %s", i, e)
-                results.extend([[0.0] * self.dim] * len(batch))
+        for embeddings in batches:
+            results.extend(embeddings)
         return results
+
+    def _post_batch(self, start: int, batch: list[str]) -> list[list[float]]:
+        try:
+            resp = self._client.post(self.endpoint_url, json={"texts": batch})
+            resp.raise_for_status()
+            return _extract_embeddings(resp.json())
+        except Exception as e:
+            logger.error("encode_batch failed for batch %d: %s", start, e)
+            return [[0.0] * self.dim] * len(batch)
@@ -2,11 +2,22 @@ import logging
 
 from mcp.server.fastmcp import FastMCP
 
+_logging_configured = False
 
-def create_mcp_app(name: str) -> FastMCP:
-    """Creates a FastMCP application instance with standardized logging."""
+
+def _configure_logging() -> None:
+    """Apply the standard logging setup once per process."""
+    global _logging_configured
+    if _logging_configured:
+        return
     logging.basicConfig(level=logging.INFO)
     logging.getLogger("mcp.server.lowlevel.server").setLevel(logging.WARNING)
+    _logging_configured = True
+
+
+def create_mcp_app(name: str) -> FastMCP:
+    """Creates a FastMCP application instance with standardized logging."""
+    _configure_logging()
     return FastMCP(name)
 
 
@@ -1,7 +1,7 @@
 """MCP-side ranking calibration and fusion.
 
 Implements:
-- rolling-window score calibration (min/max + mean/std)
+- rolling-window score calibration (min/max + mean/std, O(batch) updates)
 - per-query drift detection
 - gentle recency boost
 - source reliability prior
@@ -13,12 +13,25 @@ from __future__ import annotations
 import json
 import logging
 import math
+import os
+import threading
 from datetime import UTC, datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
 
 from common.config import BaseAgentSettings, get_base_settings
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see the "speedups" extra
+    orjson = None  # type: ignore[assignment]
+
 logger = logging.getLogger(__name__)
 
 _METHOD_WEIGHTS: dict[str, float] = {
@@ -28,23 +41,156 @@ _METHOD_WEIGHTS: dict[str, float] = {
     "graph": 0.9,
 }
 
+# Smallest log size that triggers a snapshot rewrite.
+_MIN_COMPACT_BYTES = 64 * 1024
+
+# Below this many candidates a full argsort beats partial selection.
+_PARTIAL_SORT_MIN = 1024
+
 
 def _parse_timestamp(ts: str | None) -> datetime | None:
     if not ts:
         return None
     try:
-        parsed = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+        # Python 3.11+ parses "Z" and offsets natively (C implementation).
+        parsed = datetime.fromisoformat(ts)
     except ValueError:
         return None
     if parsed.tzinfo is None:
         return parsed.replace(tzinfo=UTC)
-    return parsed.astimezone(UTC)
+    # Aware datetimes subtract correctly whatever their offset.
+    return parsed
+
+
+def _age_days(timestamp: str | None, now: datetime) -> float:
+    """Age in days (>= 0), or NaN when the timestamp is missing/unparsable."""
+    ts = _parse_timestamp(timestamp)
+    if not ts:
+        return math.nan
+    return max(0.0, (now - ts).total_seconds() / 86400.0)
 
 
 def _clamp01(value: float) -> float:
     return max(0.0, min(1.0, value))
 
 
+class _ScoreWindow:
+    """Fixed-capacity ring buffer of recent scores with running sums.
+
+    Appending a batch costs O(batch): evicted values are subtracted from the
+    running sum/sum of squares instead of rescanning the window. The sums are
+    recomputed exactly each time the buffer wraps to bound float drift.
+    """
+
+    __slots__ = ("_buf", "_head", "_size", "_sum", "_sum_sq")
+
+    def __init__(self, capacity: int, values: Iterable[float] = ()) -> None:
+        self._buf = np.zeros(capacity, dtype=np.float64)
+        self._head = 0
+        self._size = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self.extend(values)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def extend(self, values: Iterable[float]) -> None:
+        new = np.clip(np.fromiter(values, dtype=np.float64), 0.0, 1.0)
+        cap = self._buf.shape[0]
+        n = new.shape[0]
+        if n == 0:
+            return
+        if n >= cap:
+            self._buf[:] = new[-cap:]
+            self._head = 0
+            self._size = cap
+            self._resum()
+            return
+        # Empty slots hold 0.0, so "evicting" them leaves the sums unchanged.
+        idx = (self._head + np.arange(n)) % cap
+        old = self._buf[idx]
+        self._sum += float(new.sum() - old.sum())
+        self._sum_sq += float(np.dot(new, new) - np.dot(old, old))
+        self._buf[idx] = new
+        wrapped = self._head + n >= cap
+        self._head = (self._head + n) % cap
+        self._size = min(cap, self._size + n)
+        if wrapped:
+            self._resum()
+
+    def _resum(self) -> None:
+        live = self._buf[: self._size]
+        self._sum = float(live.sum())
+        self._sum_sq = float(np.dot(live, live))
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._size if self._size else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self._size:
+            return 0.0
+        mean = self._sum / self._size
+        return math.sqrt(max(0.0, self._sum_sq / self._size - mean * mean))
+
+    def min(self) -> float:
+        return float(self._buf[: self._size].min()) if self._size else 0.0
+
+    def max(self) -> float:
+        return float(self._buf[: self._size].max()) if self._size else 1.0
+
+    def tolist(self) -> list[float]:
+        """Scores oldest-first, as stored in the calibration artifact."""
+        if self._size < self._buf.shape[0]:
+            return self._buf[: self._size].tolist()
+        return np.concatenate(
+            (self._buf[self._head :], self._buf[: self._head])
+        ).tolist()
+
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k scores, descending; ties keep input order.
+
+    Same result as ``np.argsort(-scores, kind="stable")[:top_k]`` but O(n)
+    for large inputs: partition around the k-th largest score, then sort only
+    the survivors.
+    """
+    n = scores.shape[0]
+    if n < _PARTIAL_SORT_MIN or top_k <= 0 or top_k >= n:
+        return np.argsort(-scores, kind="stable")[:top_k]
+    kth = np.partition(scores, n - top_k)[n - top_k]
+    above = np.flatnonzero(scores > kth)
+    # Among scores equal to the threshold, the earliest ones win.
+    ties = np.flatnonzero(scores == kth)[: top_k - above.shape[0]]
+    keep = np.sort(np.concatenate((above, ties)))
+    return keep[np.argsort(-scores[keep], kind="stable")]
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, _ScoreWindow):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj: Any, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS if pretty else 0
+        return orjson.dumps(obj, default=_json_default, option=option)
+    if pretty:
+        text = json.dumps(obj, indent=2, sort_keys=True, default=_json_default)
+    else:
+        text = json.dumps(obj, separators=(",", ":"), default=_json_default)
+    return text.encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 class MCPScoreRanker:
     """Calibrates and ranks results on MCP server side."""
 
@@ -61,8 +207,22 @@ class MCPScoreRanker:
             str(k): float(v)
             for k, v in (cfg.LILITH_SOURCE_RELIABILITY_PRIORS or {}).items()
         }
+        # Observations are appended to a small log between full snapshots.
+        # Appended, not swapped in for the suffix, so an artifact that itself
+        # ends in .log never shares its path with the log.
+        self._log_path = self._artifact_path.with_name(
+            self._artifact_path.name + ".log"
+        )
+        self._log_fd: int | None = None
+        self._log_bytes = 0
+        # Set if a partial trailing line could not be trimmed on replay.
+        self._log_torn = False
+        self._snapshot_bytes = 0
         self._state: dict[str, Any] = self._load_state()
-        self._dirty_count = 0
+        self._log_generation = int(self._state.get("log_generation", 0))
+        self._replay_log()
+        # The default ranker is shared by every engine in the process.
+        self._lock = threading.Lock()
 
     def rank_results(
         self,
@@ -72,124 +232,163 @@ class MCPScoreRanker:
         if not results:
             return []
 
-        method_groups: dict[tuple[str, str], list[float]] = {}
+        # Struct-of-arrays layout: one "cell" per valid (result, method) score,
+        # stored row by row so each result's cells are contiguous. Each
+        # distinct (source, method) pair gets an integer key id; lookups go
+        # through per-source dicts so the hot loop builds no tuples.
+        sources: list[str] = []
+        cell_starts: list[int] = [0]
+        cell_methods: list[str] = []
+        cell_raw: list[float] = []
+        cell_key: list[int] = []
+        key_ids: dict[str, dict[str, int]] = {}
+        keys: list[tuple[str, str]] = []
+        key_values: list[list[float]] = []
         for r in results:
-            source = str(r.get("source", "") or "")
+            source = r.get("source", "") or ""
+            if type(source) is not str:
+                source = str(source)
+            sources.append(source)
+            source_keys = key_ids.get(source)
+            if source_keys is None:
+                source_keys = key_ids[source] = {}
             scores = r.get("scores", {}) or {}
-            if not source or not isinstance(scores, dict):
-                continue
-            for method, score in scores.items():
-                try:
-                    s = float(score)
-                except (TypeError, ValueError):
-                    continue
-                method_groups.setdefault((source, str(method)), []).append(_clamp01(s))
+            if isinstance(scores, dict):
+                for method, score in scores.items():
+                    try:
+                        raw = _clamp01(float(score))
+                    except (TypeError, ValueError):
+                        continue
+                    if type(method) is not str:
+                        method = str(method)
+                    k = source_keys.get(method)
+                    if k is None:
+                        k = source_keys[method] = len(keys)
+                        keys.append((source, method))
+                        key_values.append([])
+                    cell_methods.append(method)
+                    cell_raw.append(raw)
+                    cell_key.append(k)
+                    key_values[k].append(raw)
+            cell_starts.append(len(cell_raw))
+
+        # Results without a source are scored but not recorded.
+        method_groups: dict[tuple[str, str], list[float]] = {
+            key: key_values[k] for k, key in enumerate(keys) if key[0]
+        }
 
+        n_keys = len(keys)
+        key_lo = np.zeros(n_keys)
+        key_span = np.ones(n_keys)
+        key_calibrated = np.zeros(n_keys, dtype=bool)
+        key_drift = np.zeros(n_keys, dtype=bool)
+        key_weight = np.empty(n_keys)
         drift_flags: dict[tuple[str, str], bool] = {}
-        for key, values in method_groups.items():
-            source, method = key
-            stats = self._get_stats(source, method)
-            mean = float(stats.get("mean", 0.0))
-            std = float(stats.get("std", 0.0))
-            query_mean = sum(values) / len(values) if values else 0.0
-            drift = bool(
-                stats.get("count", 0) >= 50
-                and std > 1e-6
-                and abs(query_mean - mean) > self._drift_z * std
-            )
-            drift_flags[key] = drift
+        with self._lock:
+            # Flat view of the calibration state for this call; saves walking
+            # the nested source/method dicts for every key.
+            stats_view = self._stats_view()
+            for k, key in enumerate(keys):
+                key_weight[k] = _METHOD_WEIGHTS.get(key[1], 0.5)
+                stats = stats_view.get(key)
+                if stats is None:
+                    continue
+                count = int(stats.get("count", 0))
+                min_s = float(stats.get("min", 0.0))
+                max_s = float(stats.get("max", 1.0))
+                if count >= 20 and max_s - min_s >= 1e-6:
+                    key_calibrated[k] = True
+                    key_lo[k] = min_s
+                    key_span[k] = max_s - min_s
+                if key[0]:
+                    values = key_values[k]
+                    mean = float(stats.get("mean", 0.0))
+                    std = float(stats.get("std", 0.0))
+                    query_mean = sum(values) / len(values)
+                    drift = bool(
+                        count >= 50
+                        and std > 1e-6
+                        and abs(query_mean - mean) > self._drift_z * std
+                    )
+                    key_drift[k] = drift
+                    drift_flags[key] = drift
+
+        n = len(results)
+        raw_arr = np.array(cell_raw, dtype=np.float64)
+        key_idx = np.array(cell_key, dtype=np.intp)
+        row_idx = np.repeat(np.arange(n), np.diff(cell_starts))
+
+        norm = np.where(
+            key_calibrated[key_idx],
+            np.clip((raw_arr - key_lo[key_idx]) / key_span[key_idx], 0.0, 1.0),
+            raw_arr,
+        )
+        drifted = key_drift[key_idx]
+        raw_weight = np.where(drifted, 0.85, 0.7)
+        signal = raw_weight * raw_arr + (1.0 - raw_weight) * norm
+        weight = key_weight[key_idx]
+        total_weight = np.bincount(row_idx, weights=weight, minlength=n)
+        weighted_signal = np.bincount(row_idx, weights=signal * weight, minlength=n)
+        base_score = np.divide(
+            weighted_signal,
+            total_weight,
+            out=np.zeros(n),
+            where=total_weight > 0,
+        )
+        now = datetime.now(UTC)
+        recency_boost = self._recency_boosts(
+            np.array([_age_days(r.get("timestamp"), now) for r in results])
+        )
+        reliability_prior = np.array([self._get_reliability_prior(s) for s in sources])
 
-        scored: list[tuple[float, dict[str, Any]]] = []
-        for r in results:
-            score, trace = self._score_result(r, drift_flags)
+        # Keep relevance dominant. Recency/reliability are gentle multipliers.
+        final_score = np.clip(
+            base_score * (0.9 + 0.05 * recency_boost + 0.05 * reliability_prior),
+            0.0,
+            1.0,
+        )
+
+        # Ties keep their input order. Traces are only built for the results
+        # that survive the top_k cut.
+        order = _top_k_indices(final_score, top_k).tolist()
+
+        norm_list = norm.tolist()
+        signal_list = signal.tolist()
+        drifted_list = drifted.tolist()
+        ranked: list[dict[str, Any]] = []
+        for i in order:
+            r = results[i]
+            cells = range(cell_starts[i], cell_starts[i + 1])
+            trace = {
+                "raw_scores": {cell_methods[c]: cell_raw[c] for c in cells},
+                "normalized_scores": {cell_methods[c]: norm_list[c] for c in cells},
+                "method_signals": {cell_methods[c]: signal_list[c] for c in cells},
+                "base_score": round(float(base_score[i]), 4),
+                "recency_boost": round(float(recency_boost[i]), 4),
+                "reliability_prior": round(float(reliability_prior[i]), 4),
+                "drift_detected_methods": [
+                    cell_methods[c] for c in cells if drifted_list[c]
+                ],
+                "learned_ranking_enabled": self._learned_enabled,
+                "final_score": round(float(final_score[i]), 4),
+            }
             meta = dict(r.get("metadata") or {})
             meta["fusion_trace"] = trace
             r["metadata"] = meta
-            scored.append((score, r))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        ranked = [r for _, r in scored[:top_k]]
+            ranked.append(r)
 
-        self._record_observations(method_groups, drift_flags)
+        with self._lock:
+            self._record_observations(method_groups, drift_flags)
         return ranked
 
-    def _score_result(
-        self,
-        result: dict[str, Any],
-        drift_flags: dict[tuple[str, str], bool],
-    ) -> tuple[float, dict[str, Any]]:
-        source = str(result.get("source", "") or "")
-        scores = result.get("scores", {}) or {}
-
-        total_weight = 0.0
-        weighted_signal = 0.0
-        normalized_scores: dict[str, float] = {}
-        method_signals: dict[str, float] = {}
-        drifted_methods: list[str] = []
-        raw_scores: dict[str, float] = {}
-
-        for method, score in scores.items():
-            try:
-                raw = _clamp01(float(score))
-            except (TypeError, ValueError):
-                continue
-            method_str = str(method)
-            raw_scores[method_str] = raw
-            norm = self._normalize_score(source, method_str, raw)
-            normalized_scores[method_str] = norm
-
-            drift = drift_flags.get((source, method_str), False)
-            raw_weight = 0.85 if drift else 0.7
-            if drift:
-                drifted_methods.append(method_str)
-            signal = raw_weight * raw + (1.0 - raw_weight) * norm
-            method_signals[method_str] = signal
-
-            w = _METHOD_WEIGHTS.get(method_str, 0.5)
-            total_weight += w
-            weighted_signal += signal * w
-
-        base_score = weighted_signal / total_weight if total_weight > 0 else 0.0
-        recency_boost = self._compute_recency_boost(result.get("timestamp"))
-        reliability_prior = self._get_reliability_prior(source)
-
-        # Keep relevance dominant. Recency/reliability are gentle multipliers.
-        final_score = _clamp01(
-            base_score * (0.9 + 0.05 * recency_boost + 0.05 * reliability_prior)
-        )
-
-        trace = {
-            "raw_scores": raw_scores,
-            "normalized_scores": normalized_scores,
-            "method_signals": method_signals,
-            "base_score": round(base_score, 4),
-            "recency_boost": round(recency_boost, 4),
-            "reliability_prior": round(reliability_prior, 4),
-            "drift_detected_methods": drifted_methods,
-            "learned_ranking_enabled": self._learned_enabled,
-            "final_score": round(final_score, 4),
-        }
-        return final_score, trace
-
-    def _normalize_score(self, source: str, method: str, raw_score: float) -> float:
-        stats = self._get_stats(source, method)
-        count = int(stats.get("count", 0))
-        if count < 20:
-            return raw_score
-        min_s = float(stats.get("min", raw_score))
-        max_s = float(stats.get("max", raw_score))
-        if max_s - min_s < 1e-6:
-            return raw_score
-        return _clamp01((raw_score - min_s) / (max_s - min_s))
-
     def _compute_recency_boost(self, timestamp: str | None) -> float:
-        ts = _parse_timestamp(timestamp)
-        if not ts:
-            return 1.0
-        now = datetime.now(UTC)
-        age_days = max(0.0, (now - ts).total_seconds() / 86400.0)
-        # Gentle boost: [1.0, 1.05], decays slowly.
-        return 1.0 + 0.05 * math.exp(-age_days / self._recency_half_life_days)
+        age = _age_days(timestamp, datetime.now(UTC))
+        return float(self._recency_boosts(np.array([age]))[0])
+
+    def _recency_boosts(self, age_days: np.ndarray) -> np.ndarray:
+        # Gentle boost: [1.0, 1.05], decays slowly. Unknown age gets 1.0.
+        boost = 1.0 + 0.05 * np.exp(-age_days / self._recency_half_life_days)
+        return np.where(np.isnan(age_days), 1.0, boost)
 
     def _get_reliability_prior(self, source: str) -> float:
         env_prior = self._reliability_priors.get(source)
@@ -206,23 +405,102 @@ class MCPScoreRanker:
         if not self._artifact_path.exists():
             return {"version": 1, "sources": {}}
         try:
-            data = json.loads(self._artifact_path.read_text(encoding="utf-8"))
+            raw = self._artifact_path.read_bytes()
+            data = _loads(raw)
         except Exception as e:
             logger.warning("Failed to load calibration artifact: %s", e)
             return {"version": 1, "sources": {}}
         if not isinstance(data, dict):
             return {"version": 1, "sources": {}}
+        self._snapshot_bytes = len(raw)
         data.setdefault("version", 1)
         data.setdefault("sources", {})
         return data
 
+    def _replay_log(self) -> None:
+        """Fold observations logged since the last snapshot into the state."""
+        try:
+            raw = self._log_path.read_bytes()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning("Failed to read calibration log: %s", e)
+            return
+        end = raw.rfind(b"\n") + 1
+        if end < len(raw):
+            # A crash left a partial last line. Cut it off so the next append
+            # starts on a fresh line instead of being glued onto it.
+            try:
+                os.truncate(self._log_path, end)
+                raw = raw[:end]
+            except OSError as e:
+                logger.warning("Failed to trim calibration log: %s", e)
+                self._log_torn = True
+        self._log_bytes = len(raw)
+        for line in raw.splitlines():
+            try:
+                entry = _loads(line)
+                if int(entry.get("g", 0)) < self._log_generation:
+                    # Already folded into the snapshot; the log was not
+                    # truncated before the process stopped.
+                    continue
+                values = [float(v) for v in entry["v"]]
+                self._apply_observation(
+                    str(entry["s"]), str(entry["m"]), values, bool(entry.get("d"))
+                )
+            except Exception:
+                # Torn trailing write or a foreign line; skip it.
+                continue
+
     def _save_state(self) -> None:
+        """Write a full snapshot and reset the observation log."""
+        self._log_generation += 1
+        self._state["log_generation"] = self._log_generation
         self._state["updated_at"] = datetime.now(UTC).isoformat()
+        data = _dumps(self._state, pretty=True)
         self._artifact_path.parent.mkdir(parents=True, exist_ok=True)
-        self._artifact_path.write_text(
-            json.dumps(self._state, indent=2, sort_keys=True),
-            encoding="utf-8",
-        )
+        tmp_path = self._artifact_path.with_name(self._artifact_path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(self._artifact_path)
+        self._snapshot_bytes = len(data)
+        if self._log_fd is not None:
+            os.ftruncate(self._log_fd, 0)
+        else:
+            self._log_path.unlink(missing_ok=True)
+        self._log_bytes = 0
+        self._log_torn = False
+
+    def _append_log(self, data: bytes) -> None:
+        if self._log_fd is None:
+            self._log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log_fd = os.open(
+                self._log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+            )
+        if self._log_torn:
+            data = b"\n" + data
+            self._log_torn = False
+        os.write(self._log_fd, data)
+        self._log_bytes += len(data)
+
+    def close(self) -> None:
+        """Close the observation log; later observations reopen it."""
+        with self._lock:
+            if self._log_fd is not None:
+                os.close(self._log_fd)
+                self._log_fd = None
+
+    def _stats_view(self) -> dict[tuple[str, str], dict[str, Any]]:
+        view: dict[tuple[str, str], dict[str, Any]] = {}
+        for source, source_state in self._state.get("sources", {}).items():
+            methods = (
+                source_state.get("methods") if isinstance(source_state, dict) else None
+            )
+            if not isinstance(methods, dict):
+                continue
+            for method, stats in methods.items():
+                if isinstance(stats, dict):
+                    view[(source, method)] = stats
+        return view
 
     def _get_stats(self, source: str, method: str) -> dict[str, Any]:
         source_state = self._state.setdefault("sources", {}).setdefault(source, {})
@@ -230,7 +508,7 @@ class MCPScoreRanker:
         stats = methods.setdefault(
             method,
             {
-                "scores": [],
+                "scores": _ScoreWindow(self._window_size),
                 "count": 0,
                 "min": 0.0,
                 "max": 1.0,
@@ -239,8 +517,30 @@ class MCPScoreRanker:
                 "drift_events": 0,
             },
         )
+        scores = stats.get("scores")
+        if not isinstance(scores, _ScoreWindow):
+            # Loaded from the artifact as a plain list.
+            stats["scores"] = _ScoreWindow(
+                self._window_size,
+                (float(x) for x in scores or [] if isinstance(x, int | float)),
+            )
         return stats
 
+    def _apply_observation(
+        self, source: str, method: str, values: list[float], drifted: bool
+    ) -> None:
+        stats = self._get_stats(source, method)
+        window: _ScoreWindow = stats["scores"]
+        window.extend(values)
+
+        stats["count"] = len(window)
+        stats["min"] = window.min()
+        stats["max"] = window.max()
+        stats["mean"] = window.mean
+        stats["std"] = window.std
+        if drifted:
+            stats["drift_events"] = int(stats.get("drift_events", 0)) + 1
+
     def _record_observations(
         self,
         method_groups: dict[tuple[str, str], list[float]],
@@ -248,33 +548,33 @@ class MCPScoreRanker:
     ) -> None:
         if not method_groups:
             return
+        lines: list[bytes] = []
         for (source, method), values in method_groups.items():
-            stats = self._get_stats(source, method)
-            existing = [
-                float(x) for x in stats.get("scores", []) if isinstance(x, int | float)
-            ]
-            merged = existing + [_clamp01(v) for v in values]
-            if len(merged) > self._window_size:
-                merged = merged[-self._window_size :]
-
-            count = len(merged)
-            mean = sum(merged) / count if count else 0.0
-            variance = sum((x - mean) ** 2 for x in merged) / count if count else 0.0
-            std = math.sqrt(variance)
-
-            stats["scores"] = merged
-            stats["count"] = count
-            stats["min"] = min(merged) if merged else 0.0
-            stats["max"] = max(merged) if merged else 1.0
-            stats["mean"] = mean
-            stats["std"] = std
-            if drift_flags.get((source, method), False):
-                stats["drift_events"] = int(stats.get("drift_events", 0)) + 1
-
-        self._dirty_count += 1
-        if self._dirty_count >= 10:
-            try:
+            drifted = drift_flags.get((source, method), False)
+            self._apply_observation(source, method, values, drifted)
+            lines.append(
+                _dumps(
+                    {
+                        "g": self._log_generation,
+                        "s": source,
+                        "m": method,
+                        "v": values,
+                        "d": drifted,
+                    }
+                )
+            )
+
+        # Only the new observations are written; the full snapshot is
+        # rewritten once the log outgrows it.
+        try:
+            self._append_log(b"\n".join(lines) + b"\n")
+            if self._log_bytes > max(self._snapshot_bytes, _MIN_COMPACT_BYTES):
                 self._save_state()
-            except Exception as e:
-                logger.warning("Failed to persist calibration artifact: %s", e)
-            self._dirty_count = 0
+        except Exception as e:
+            logger.warning("Failed to persist calibration artifact: %s", e)
+
+
+@lru_cache
+def get_default_ranker() -> MCPScoreRanker:
+    """Process-wide ranker, so engines share one calibration state."""
+    return MCPScoreRanker()
@@ -1,19 +1,139 @@
-import time
+import logging
 from abc import ABC, abstractmethod
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from time import perf_counter_ns, thread_time_ns
 from typing import Any, Generic, TypeVar
 
-from common.ranking import MCPScoreRanker
+import numpy as np
+
+from common.ranking import get_default_ranker
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# Shared by engines that opt in with concurrent_backends = True. Backends are
+# I/O-bound (DB, HTTP), so threads overlap their waits and a search costs
+# max(methods) rather than their sum.
+_EXECUTOR = ThreadPoolExecutor(max_workers=6, thread_name_prefix="hybrid-search")
+
+# Per-method fetch limit as a multiple of top_k. MCPScoreRanker scores each
+# candidate by the weighted mean of its calibrated per-method scores; rank
+# position earns nothing by itself. A hit below top_k in one list can still
+# place when hits above it are pulled down by weaker scores from another
+# method, so fulltext/vector fetch some extra depth. That gets rarer the
+# deeper a hit is, since it also scores lower in its own method. Every
+# fetched score also feeds the ranker's calibration windows, so changing
+# these factors shifts calibration. Structured keeps the previous 2x, so its
+# recall is unchanged.
+_LIMIT_FACTORS = {"structured": 2, "fulltext": 3, "vector": 3}
+
+# Backend calls longer than this that spend more than this share of their
+# wall time on CPU are reported by _run_timed when DEBUG logging is on.
+_CPU_CHECK_MIN_NS = 5_000_000
+_CPU_BOUND_RATIO = 0.9
+
+# Marks an empty score cell in search(); backends may return None scores.
+_MISSING: Any = object()
+
+_Backend = Callable[..., list[tuple[Any, float]]]
+# (batch, error, elapsed_ms) as returned by _run_timed.
+_TimedBatch = tuple[list[tuple[Any, float]] | None, Exception | None, float]
+
+
+def _elapsed_ms(t0: int) -> float:
+    """Milliseconds since the perf_counter_ns() reading t0, to 0.1 ms."""
+    return round((perf_counter_ns() - t0) / 1_000_000, 1)
+
+
+def _run_timed(fn: _Backend, *args: Any) -> _TimedBatch:
+    """Run one backend call, returning (batch, error, elapsed_ms)."""
+    # With DEBUG logging on, also flag backends that spend their time on
+    # CPU: pure-Python work holds the GIL and serializes the other methods.
+    check_cpu = logger.isEnabledFor(logging.DEBUG)
+    c0 = thread_time_ns() if check_cpu else 0
+    t0 = perf_counter_ns()
+    try:
+        batch, error = fn(*args), None
+    except Exception as e:
+        batch, error = None, e
+    wall = perf_counter_ns() - t0
+    if check_cpu and wall > _CPU_CHECK_MIN_NS:
+        cpu_ratio = (thread_time_ns() - c0) / wall
+        if cpu_ratio > _CPU_BOUND_RATIO:
+            logger.warning(
+                "%s was CPU-bound (%.0f%% of %.1f ms); "
+                "GIL-holding work stops search methods overlapping",
+                getattr(fn, "__name__", fn),
+                cpu_ratio * 100,
+                wall / 1_000_000,
+            )
+    return batch, error, round(wall / 1_000_000, 1)
+
+
+@lru_cache(maxsize=16)
+def _rrf_weights(n: int, k: int) -> np.ndarray:
+    """Read-only [1/(k+1), ..., 1/(k+n)], the RRF weight of each rank."""
+    weights = 1.0 / (k + np.arange(n, dtype=np.float64) + 1)
+    weights.setflags(write=False)
+    return weights
+
+
+@lru_cache(maxsize=16)
+def _rrf_weight_tuple(n: int, k: int) -> tuple[float, ...]:
+    """_rrf_weights(n, k) as Python floats, for the pure-Python fast path."""
+    return tuple(_rrf_weights(n, k).tolist())
+
+
+def _rrf_two(
+    a: list[dict[str, Any]], b: list[dict[str, Any]], k: int
+) -> list[dict[str, Any]]:
+    """rrf_fusion() for exactly two groups, without the NumPy round trip.
+
+    Same scores (summed in the same order) and same tie order as the
+    general path; for two lists a dict walk beats building index arrays.
+    """
+    weights = _rrf_weight_tuple(1 << (max(len(a), len(b), 1) - 1).bit_length(), k)
+    scores: dict[Any, float] = {}
+    get = scores.get
+    for group in (a, b):
+        for result, weight in zip(group, weights, strict=False):
+            doc_id = result.get("id")
+            if doc_id is not None:
+                scores[doc_id] = get(doc_id, 0.0) + weight
+    # sorted() is stable under reverse=True, so ties keep first-seen order.
+    ranked = sorted(scores.items(), key=itemgetter(1), reverse=True)
+    return [{"id": doc_id, "score": score} for doc_id, score in ranked]
+
 
 class BaseHybridSearchEngine(ABC, Generic[T]):
-    """Base class for hybrid search engines (Email, Browser, WhatsApp)."""
+    """Base class for hybrid search engines (Email, Browser, WhatsApp).
+
+    By default _structured, _fulltext and _vector run one after another on
+    the calling thread. Passing an executor, or setting concurrent_backends
+    to use the shared pool, runs them at the same time on pool threads. Only
+    opt in when the backends are thread-safe: a SQLAlchemy Session or a
+    psycopg2 connection must not be shared between them, so each backend
+    should open its own, e.g. with DatabaseManager.read_session(). They also
+    only overlap if they spend their time in code that releases the GIL:
+    database drivers, HTTP clients, or native index/NumPy calls, not Python
+    loops.
+    """
+
+    # Run backends on the shared _EXECUTOR when no executor is passed.
+    concurrent_backends: bool = False
 
-    def __init__(self, db: Any, embedder: Any = None):
+    def __init__(self, db: Any, embedder: Any = None, executor: Executor | None = None):
         self.db = db
         self.embedder = embedder
-        self._ranker = MCPScoreRanker()
+        # Runs the per-method backend calls; None runs them inline.
+        if executor is None and self.concurrent_backends:
+            executor = _EXECUTOR
+        self._executor = executor
+        self._ranker = get_default_ranker()
 
     @abstractmethod
     def _get_item_id(self, item: T) -> Any:
@@ -45,101 +165,224 @@ class BaseHybridSearchEngine(ABC, Generic[T]):
         """Perform semantic search."""
         return []
 
+    def _vector_with_embedding(
+        self,
+        query: str,
+        embedding: list[float] | None,
+        filters: list[dict] | None,
+        limit: int,
+    ) -> list[tuple[T, float]]:
+        """Semantic search with a precomputed query embedding.
+
+        search_batch() embeds all queries in one call and passes each vector
+        here. Engines that embed inside _vector should override this to skip
+        re-embedding; the default ignores the embedding and calls _vector.
+        """
+        return self._vector(query, filters, limit)
+
     def search(
         self,
         query: str = "",
         methods: list[str] | None = None,
         filters: list[dict] | None = None,
         top_k: int = 10,
+        per_method_limits: dict[str, int] | None = None,
     ) -> tuple[list[dict[str, Any]], dict[str, float], list[str]]:
-        """Main hybrid search entry point."""
-        t_start = time.monotonic()
+        """Main hybrid search entry point.
+
+        per_method_limits overrides how many candidates each method fetches;
+        methods not listed default to top_k times their _LIMIT_FACTORS entry.
+        """
+        t_start = perf_counter_ns()
+        methods = methods or ["structured", "fulltext", "vector"]
+        futures = self._submit_methods(
+            query, methods, filters, top_k, per_method_limits
+        )
+        return self._collect(futures, top_k, t_start)
+
+    def search_batch(
+        self,
+        queries: list[str],
+        methods: list[str] | None = None,
+        filters: list[dict] | None = None,
+        top_k: int = 10,
+        per_method_limits: dict[str, int] | None = None,
+    ) -> list[tuple[list[dict[str, Any]], dict[str, float], list[str]]]:
+        """Run search() for several queries, returning one result per query.
+
+        Backend calls for every query are submitted before any is awaited (they
+        run inline if the engine has no executor). If the engine overrides
+        _vector_with_embedding, all query embeddings are computed up front in
+        a single embedding request via embedder.encode_batch().
+        """
+        t_start = perf_counter_ns()
         methods = methods or ["structured", "fulltext", "vector"]
+        embeddings: list[list[float] | None] = [None] * len(queries)
+        if (
+            "vector" in methods
+            and self.embedder is not None
+            and type(self)._vector_with_embedding
+            is not BaseHybridSearchEngine._vector_with_embedding
+        ):
+            to_embed = [i for i, q in enumerate(queries) if q and q.strip()]
+            if to_embed:
+                # One request for the whole batch, not encode_batch's default
+                # chunks of 4.
+                vectors = self.embedder.encode_batch(
+                    [queries[i] for i in to_embed], batch_size=len(to_embed)
+                )
+                for i, vector in zip(to_embed, vectors, strict=False):
+                    embeddings[i] = vector
+
+        pending = [
+            self._submit_methods(
+                query, methods, filters, top_k, per_method_limits, embedding
+            )
+            for query, embedding in zip(queries, embeddings, strict=True)
+        ]
+        return [self._collect(futures, top_k, t_start) for futures in pending]
+
+    def _submit_methods(
+        self,
+        query: str,
+        methods: list[str],
+        filters: list[dict] | None,
+        top_k: int,
+        per_method_limits: dict[str, int] | None,
+        embedding: list[float] | None = None,
+    ) -> dict[str, Future[_TimedBatch]]:
+        """Submit each requested backend call to the executor."""
+        has_query = bool(query and query.strip())
+        # (name, backend, requires a non-empty query)
+        dispatch: tuple[tuple[str, _Backend, bool], ...] = (
+            ("structured", self._structured, False),
+            ("fulltext", self._fulltext, True),
+            ("vector", self._vector, True),
+        )
+        limits = {name: top_k * factor for name, factor in _LIMIT_FACTORS.items()}
+        if per_method_limits:
+            limits.update(per_method_limits)
+        futures: dict[str, Future[_TimedBatch]] = {}
+        for name, fn, needs_query in dispatch:
+            if name not in methods or (needs_query and not has_query):
+                continue
+            limit = limits[name]
+            if name == "vector" and embedding is not None:
+                args: tuple[Any, ...] = (query, embedding, filters, limit)
+                fn = self._vector_with_embedding
+            elif needs_query:
+                args = (query, filters, limit)
+            else:
+                args = (filters, limit)
+            if self._executor is None:
+                futures[name] = Future()
+                futures[name].set_result(_run_timed(fn, *args))
+            else:
+                futures[name] = self._executor.submit(_run_timed, fn, *args)
+        return futures
+
+    def _collect(
+        self, futures: dict[str, Future[_TimedBatch]], top_k: int, t_start: int
+    ) -> tuple[list[dict[str, Any]], dict[str, float], list[str]]:
+        """Wait for the backend calls, then fuse and rank their hits."""
         timing = {}
         methods_executed = []
 
-        all_results: dict[Any, dict[str, Any]] = {}  # id -> {item, scores, methods}
+        # Hits are stored column-wise: one row per unique item (first-seen
+        # order) and one score column per method, _MISSING where it missed.
+        id_to_idx: dict[Any, int] = {}
+        items: list[T] = []
+        columns: dict[str, list[Any]] = {}
 
         def add_batch(batch: list[tuple[T, float]], method_name: str):
             if not batch:
                 return
             methods_executed.append(method_name)
+            column: list[Any] = [_MISSING] * len(items)
+            columns[method_name] = column
+            get_id = self._get_item_id
             for item, score in batch:
-                item_id = self._get_item_id(item)
-                if item_id not in all_results:
-                    all_results[item_id] = {"item": item, "scores": {}, "methods": []}
-                all_results[item_id]["scores"][method_name] = score
-                if method_name not in all_results[item_id]["methods"]:
-                    all_results[item_id]["methods"].append(method_name)
-
-        # 1. Structured
-        if "structured" in methods:
-            t0 = time.monotonic()
-            try:
-                batch = self._structured(filters, top_k * 2)
-                add_batch(batch, "structured")
-            except Exception as e:
-                import logging
-
-                logging.getLogger("common.search").warning(
-                    "Structured search failed: %s", e
-                )
-            timing["structured"] = round((time.monotonic() - t0) * 1000, 1)
-
-        # 2. Fulltext
-        if "fulltext" in methods and query and query.strip():
-            t0 = time.monotonic()
-            try:
-                batch = self._fulltext(query, filters, top_k * 2)
-                add_batch(batch, "fulltext")
-            except Exception as e:
-                import logging
-
-                logging.getLogger("common.search").warning(
-                    "Fulltext search failed: %s", e
-                )
-            timing["fulltext"] = round((time.monotonic() - t0) * 1000, 1)
-
-        # 3. Vector
-        if "vector" in methods and query and query.strip():
-            t0 = time.monotonic()
-            try:
-                batch = self._vector(query, filters, top_k * 2)
-                add_batch(batch, "vector")
-            except Exception as e:
-                import logging
-
-                logging.getLogger("common.search").warning(
-                    "Vector search failed: %s", e
-                )
-            timing["vector"] = round((time.monotonic() - t0) * 1000, 1)
+                item_id = get_id(item)
+                idx = id_to_idx.get(item_id)
+                if idx is None:
+                    id_to_idx[item_id] = len(items)
+                    items.append(item)
+                    column.append(score)
+                else:
+                    column[idx] = score
+
+        # Merge in a fixed order so results don't depend on thread scheduling.
+        for name, future in futures.items():
+            batch, error, elapsed_ms = future.result()
+            if error is not None:
+                logger.warning("%s search failed: %s", name.capitalize(), error)
+            elif batch:
+                add_batch(batch, name)
+            timing[name] = elapsed_ms
 
-        # 4. Fusion & Format
+        # Fusion & Format
         fusion_results: list[dict[str, Any]] = []
-        for res in all_results.values():
-            formatted = self._format_result(res["item"], res["scores"], res["methods"])
-            fusion_results.append(formatted)
-        t_fusion = time.monotonic()
+        if len(columns) == 1:
+            # One method hit: every row has a score, nothing to merge.
+            ((name, column),) = columns.items()
+            for item, value in zip(items, column, strict=True):
+                formatted = self._format_result(item, {name: value}, [name])
+                fusion_results.append(formatted)
+        else:
+            n_items = len(items)
+            for column in columns.values():
+                column.extend([_MISSING] * (n_items - len(column)))
+            for idx, item in enumerate(items):
+                scores = {
+                    name: score
+                    for name, column in columns.items()
+                    if (score := column[idx]) is not _MISSING
+                }
+                formatted = self._format_result(item, scores, list(scores))
+                fusion_results.append(formatted)
+        t_fusion = perf_counter_ns()
         results = self._ranker.rank_results(fusion_results, top_k=top_k)
-        timing["fusion"] = round((time.monotonic() - t_fusion) * 1000, 1)
+        timing["fusion"] = _elapsed_ms(t_fusion)
 
-        timing["total"] = round((time.monotonic() - t_start) * 1000, 1)
+        timing["total"] = _elapsed_ms(t_start)
         return results, timing, methods_executed
 
     def rrf_fusion(
         self, results_groups: list[list[dict[str, Any]]], k: int = 60
     ) -> list[dict[str, Any]]:
         """Reciprocal Rank Fusion (RRF) to combine multiple search result sets."""
-        scores: dict[Any, float] = {}
+        if len(results_groups) == 2:
+            return _rrf_two(results_groups[0], results_groups[1], k)
+        # Map doc ids to dense integer codes in first-seen order (np.unique
+        # would need orderable ids and would reorder ties), then sum every
+        # 1/(k + rank + 1) contribution per code in one bincount. The
+        # reciprocal ranks come from a cached table whose length is the
+        # longest group rounded up to a power of two, so that varying group
+        # lengths share entries.
+        codes: dict[Any, int] = {}
+        doc_codes: list[int] = []
+        doc_ranks: list[int] = []
         for group in results_groups:
             for rank, result in enumerate(group):
                 doc_id = result.get("id")
                 if doc_id is None:
                     continue
-                scores[doc_id] = scores.get(doc_id, 0) + 1 / (k + rank + 1)
+                doc_codes.append(codes.setdefault(doc_id, len(codes)))
+                doc_ranks.append(rank)
+        if not codes:
+            return []
 
-        return sorted(
-            [{"id": doc_id, "score": score} for doc_id, score in scores.items()],
-            key=lambda x: x["score"],
-            reverse=True,
+        max_len = max(len(group) for group in results_groups)
+        inv_ranks = _rrf_weights(1 << (max_len - 1).bit_length(), k)
+        scores = np.bincount(
+            np.array(doc_codes, dtype=np.intp),
+            weights=inv_ranks[np.array(doc_ranks, dtype=np.intp)],
+            minlength=len(codes),
         )
+        # Stable, so equal scores keep first-seen order.
+        order = np.argsort(-scores, kind="stable")
+        doc_ids = list(codes)
+        return [
+            {"id": doc_ids[i], "score": score}
+            for i, score in zip(order.tolist(), scores[order].tolist(), strict=True)
+        ]
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import text
+
+from common.database import DatabaseManager, _get_manager, get_db
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    yield url
+    _get_manager(url).engine.dispose()
+    _get_manager.cache_clear()
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_manager_accepts_non_queue_pool_urls(url):
+    manager = DatabaseManager(url)
+    with manager.db_session() as session:
+        assert session.execute(text("SELECT 1")).scalar() == 1
+    manager.engine.dispose()
+
+
+def test_get_db_reuses_one_manager_per_url(db_url):
+    manager = _get_manager(db_url)
+    assert _get_manager(db_url) is manager
+    assert manager.engine.pool.size() == 10
+
+    session = next(get_db(db_url))
+    assert session.get_bind() is manager.engine
+
+
+def test_read_session_does_not_commit(db_url):
+    manager = _get_manager(db_url)
+    with manager.db_session() as session:
+        session.execute(text("CREATE TABLE t (x INTEGER)"))
+    with manager.read_session() as session:
+        session.execute(text("INSERT INTO t VALUES (1)"))
+        assert session.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+    with manager.read_session() as session:
+        assert session.execute(text("SELECT COUNT(*) FROM t")).scalar() == 0
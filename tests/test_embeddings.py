@@ -0,0 +1,188 @@
+import asyncio
+import gc
+import json
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from common.embeddings import Embedder
+
+
+def _embedder(requests: list[list[str]], **kwargs) -> Embedder:
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["texts"]
+        requests.append(texts)
+        return httpx.Response(
+            200, json={"embeddings": [[float(len(t)), 0.0] for t in texts]}
+        )
+
+    embedder = Embedder("http://embed.test/embed", dim=2, **kwargs)
+    embedder._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return embedder
+
+
+def test_encode_sync_coalesces_concurrent_calls():
+    requests: list[list[str]] = []
+    embedder = _embedder(requests, max_batch=8, max_wait_ms=50.0)
+    texts = ["x" * i for i in range(1, 17)]
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            vectors = list(pool.map(embedder.encode_sync, texts))
+    finally:
+        embedder.close()
+
+    assert vectors == [[float(i), 0.0] for i in range(1, 17)]
+    assert len(requests) < len(texts)
+    assert all(len(batch) <= 8 for batch in requests)
+
+
+def test_encode_sync_blank_text_skips_request():
+    requests: list[list[str]] = []
+    embedder = _embedder(requests)
+    try:
+        assert embedder.encode_sync("   ") == [0.0, 0.0]
+    finally:
+        embedder.close()
+    assert requests == []
+
+
+def test_encode_batch_keeps_input_order_across_concurrent_batches():
+    requests: list[list[str]] = []
+    embedder = _embedder(requests)
+    texts = ["x" * i for i in range(1, 12)]
+    try:
+        vectors = embedder.encode_batch(texts, batch_size=3, max_inflight=4)
+    finally:
+        embedder.close()
+
+    assert vectors == [[float(i), 0.0] for i in range(1, 12)]
+    assert sorted(len(batch) for batch in requests) == [2, 3, 3, 3]
+
+
+def test_openai_style_responses_are_normalized():
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["texts"]
+        return httpx.Response(
+            200, json={"data": [{"embedding": [float(len(t)), 1.0]} for t in texts]}
+        )
+
+    embedder = Embedder("http://embed.test/embed", dim=2)
+    embedder._client = httpx.Client(transport=httpx.MockTransport(handler))
+    try:
+        assert embedder.encode_sync("abc") == [3.0, 1.0]
+        assert embedder.encode_batch(["a", "bb"]) == [[1.0, 1.0], [2.0, 1.0]]
+    finally:
+        embedder.close()
+
+
+def test_cancelled_callers_do_not_stall_the_batcher():
+    requests: list[list[str]] = []
+    entered, release = threading.Event(), threading.Event()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["texts"]
+        requests.append(texts)
+        if texts == ["block"]:
+            entered.set()
+            release.wait(5)
+        return httpx.Response(
+            200, json={"embeddings": [[float(len(t)), 0.0] for t in texts]}
+        )
+
+    embedder = Embedder("http://embed.test/embed", dim=2, max_batch=1)
+    embedder._client = httpx.Client(transport=httpx.MockTransport(handler))
+    try:
+        # Times out while its request is in flight, cancelling the wrapper.
+        async def timed_out():
+            await asyncio.wait_for(embedder.encode("block"), 0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(timed_out())
+        assert entered.wait(5)
+        # Cancelled while still queued behind the in-flight request.
+        queued = embedder._submit("gone")
+        assert queued.cancel()
+        release.set()
+
+        # A daemon thread, so a stalled batcher fails the test instead of
+        # hanging it.
+        later: Future[list[float]] = Future()
+        threading.Thread(
+            target=lambda: later.set_result(embedder.encode_sync("abc")), daemon=True
+        ).start()
+        assert later.result(5) == [3.0, 0.0]
+    finally:
+        release.set()
+        embedder.close()
+
+    assert ["gone"] not in requests
+
+
+class _EmbedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients pool connections
+
+    def do_POST(self):
+        texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps(
+            {"embeddings": [[float(len(t)), 1.0] for t in texts["texts"]]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_async_encode_works_across_event_loops():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    embedder = Embedder(f"http://127.0.0.1:{server.server_port}/embed", dim=2)
+    try:
+        # Each asyncio.run() has its own loop; the second must not reuse
+        # connections left on the first, now closed, loop.
+        for _ in range(2):
+            vectors = asyncio.run(embedder.encode(["a", "bb"]))
+            assert vectors == [[1.0, 1.0], [2.0, 1.0]]
+    finally:
+        embedder.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_unreferenced_embedder_is_collected_and_stops_its_worker():
+    requests: list[list[str]] = []
+    embedder = _embedder(requests)
+    assert embedder.encode_sync("abc") == [3.0, 0.0]
+    worker = embedder._worker
+    ref = weakref.ref(embedder)
+
+    del embedder
+    gc.collect()
+
+    assert ref() is None
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+
+
+def test_lone_encode_sync_is_sent_without_waiting():
+    requests: list[list[str]] = []
+    embedder = _embedder(requests)
+    try:
+        embedder.encode_sync("warm")  # starts the worker
+        t0 = time.perf_counter()
+        for _ in range(20):
+            assert embedder.encode_sync("abc") == [3.0, 0.0]
+        per_call_ms = (time.perf_counter() - t0) * 1000 / 20
+    finally:
+        embedder.close()
+
+    # Well under the 5 ms window the batcher used to wait out on every call.
+    assert per_call_ms < 2.5
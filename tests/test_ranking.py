@@ -1,7 +1,10 @@
 from datetime import UTC, datetime, timedelta
 
+import numpy as np
+import pytest
+
 from common.config import BaseAgentSettings
-from common.ranking import MCPScoreRanker
+from common.ranking import MCPScoreRanker, _top_k_indices
 
 
 def _settings(tmp_path, **kwargs) -> BaseAgentSettings:
@@ -92,3 +95,128 @@ def test_recency_is_gentle(tmp_path):
     assert recent <= 1.05
     assert old >= 1.0
     assert recent >= old
+
+
+def test_rolling_stats_survive_save_and_reload(tmp_path):
+    settings = _settings(tmp_path, LILITH_SCORE_WINDOW_SIZE=100)
+    ranker = MCPScoreRanker(settings=settings)
+    scores = [(i % 7) / 7 for i in range(130)]
+    ranker.rank_results(
+        [
+            {"id": str(i), "source": "email", "scores": {"vector": s}}
+            for i, s in enumerate(scores)
+        ],
+        top_k=5,
+    )
+    ranker._save_state()
+
+    expected = scores[-100:]
+    stats = MCPScoreRanker(settings=settings)._get_stats("email", "vector")
+    assert stats["scores"].tolist() == expected
+    assert stats["mean"] == pytest.approx(sum(expected) / len(expected))
+    assert stats["min"] == min(expected)
+    assert stats["max"] == max(expected)
+
+
+def test_fusion_trace_only_built_for_returned_results(tmp_path):
+    ranker = MCPScoreRanker(settings=_settings(tmp_path))
+    results = [
+        {"id": str(i), "source": "email", "scores": {"fulltext": i / 10}}
+        for i in range(10)
+    ]
+
+    ranked = ranker.rank_results(results, top_k=3)
+
+    assert [r["id"] for r in ranked] == ["9", "8", "7"]
+    assert all("fusion_trace" in r["metadata"] for r in ranked)
+    assert all("metadata" not in r for r in results[:7])
+
+
+def test_observations_are_replayed_from_log(tmp_path):
+    settings = _settings(tmp_path)
+    ranker = MCPScoreRanker(settings=settings)
+    for batch in range(3):
+        ranker.rank_results(
+            [
+                {"id": str(i), "source": "email", "scores": {"vector": i / 10}}
+                for i in range(batch, batch + 5)
+            ],
+            top_k=5,
+        )
+    expected = ranker._get_stats("email", "vector")["scores"].tolist()
+
+    assert not (tmp_path / "calibration.json").exists()
+    reloaded = MCPScoreRanker(settings=settings)._get_stats("email", "vector")
+    assert reloaded["scores"].tolist() == expected
+    assert reloaded["count"] == 15
+
+
+def test_snapshot_truncates_log_without_double_counting(tmp_path):
+    settings = _settings(tmp_path)
+    ranker = MCPScoreRanker(settings=settings)
+    log_before_snapshot = None
+    for step in range(2):
+        ranker.rank_results(
+            [{"id": "a", "source": "email", "scores": {"fulltext": 0.5}}],
+            top_k=1,
+        )
+        if step == 0:
+            log_before_snapshot = (tmp_path / "calibration.json.log").read_bytes()
+            ranker._save_state()
+            assert (tmp_path / "calibration.json.log").read_bytes() == b""
+
+    # Simulate a crash between the snapshot write and the log truncation:
+    # entries from before the snapshot must not be applied twice.
+    log_path = tmp_path / "calibration.json.log"
+    log_path.write_bytes(log_before_snapshot + log_path.read_bytes())
+    reloaded = MCPScoreRanker(settings=settings)._get_stats("email", "fulltext")
+    assert reloaded["count"] == 2
+
+
+def test_torn_log_line_does_not_swallow_the_next_entry(tmp_path):
+    settings = _settings(tmp_path)
+    ranker = MCPScoreRanker(settings=settings)
+    ranker.rank_results(
+        [{"id": "a", "source": "email", "scores": {"vector": 0.5}}], top_k=1
+    )
+    ranker.close()
+    log_path = tmp_path / "calibration.json.log"
+    # A crash mid-write leaves a partial last line with no newline.
+    log_path.write_bytes(log_path.read_bytes() + b'{"g":0,"s":"em')
+
+    restarted = MCPScoreRanker(settings=settings)
+    restarted.rank_results(
+        [{"id": "b", "source": "email", "scores": {"vector": 0.7}}], top_k=1
+    )
+    restarted.close()
+
+    reloaded = MCPScoreRanker(settings=settings)._get_stats("email", "vector")
+    assert reloaded["scores"].tolist() == [0.5, 0.7]
+    assert log_path.read_bytes().endswith(b"\n")
+
+
+def test_log_suffixed_artifact_path_keeps_snapshot_and_log_apart(tmp_path):
+    settings = BaseAgentSettings(
+        LILITH_SCORE_CALIBRATION_PATH=str(tmp_path / "calibration.log")
+    )
+    ranker = MCPScoreRanker(settings=settings)
+    for score in (0.2, 0.4):
+        ranker.rank_results(
+            [{"id": "a", "source": "email", "scores": {"vector": score}}], top_k=1
+        )
+        if score == 0.2:
+            ranker._save_state()
+    ranker.close()
+
+    for _ in range(2):
+        reloaded = MCPScoreRanker(settings=settings)
+        assert reloaded._get_stats("email", "vector")["scores"].tolist() == [0.2, 0.4]
+        reloaded.close()
+
+
+def test_top_k_selection_matches_stable_sort_on_large_inputs():
+    rng = np.random.default_rng(0)
+    scores = np.round(rng.random(5000), 2)  # plenty of ties
+    for top_k in (1, 10, 333, 4999):
+        expected = np.argsort(-scores, kind="stable")[:top_k]
+        assert _top_k_indices(scores, top_k).tolist() == expected.tolist()
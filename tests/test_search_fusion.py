@@ -1,5 +1,16 @@
+import logging
+import random
+import threading
+
+import common.search as search_module
 from common.config import BaseAgentSettings
-from common.search import BaseHybridSearchEngine
+from common.search import BaseHybridSearchEngine, _run_timed
+
+
+def _settings(tmp_path) -> BaseAgentSettings:
+    return BaseAgentSettings(
+        LILITH_SCORE_CALIBRATION_PATH=str(tmp_path / "calibration.json"),
+    )
 
 
 class _DummyEngine(BaseHybridSearchEngine[dict]):
@@ -31,13 +42,209 @@ class _DummyEngine(BaseHybridSearchEngine[dict]):
 
 
 def test_base_search_uses_ranker_and_emits_fusion_trace(tmp_path):
-    settings = BaseAgentSettings(
-        LILITH_SCORE_CALIBRATION_PATH=str(tmp_path / "calibration.json"),
-    )
-    engine = _DummyEngine(settings=settings)
+    engine = _DummyEngine(settings=_settings(tmp_path))
     results, timing, methods = engine.search(query="hello", top_k=2)
 
     assert len(results) == 2
     assert "fusion" in timing
     assert set(methods) == {"structured", "vector"}
     assert "fusion_trace" in results[0]["metadata"]
+
+
+class _BarrierEngine(_DummyEngine):
+    """Each backend waits for the other two, so they only finish if run together."""
+
+    concurrent_backends = True
+
+    def __init__(self, settings: BaseAgentSettings):
+        super().__init__(settings)
+        self.barrier = threading.Barrier(3, timeout=5)
+
+    def _structured(self, filters, limit):
+        self.barrier.wait()
+        return [({"id": 1}, 0.4)]
+
+    def _fulltext(self, query, filters, limit):
+        self.barrier.wait()
+        return [({"id": 2}, 0.6)]
+
+    def _vector(self, query, filters, limit):
+        self.barrier.wait()
+        return [({"id": 3}, 0.8)]
+
+
+def test_search_runs_methods_concurrently(tmp_path):
+    engine = _BarrierEngine(settings=_settings(tmp_path))
+    results, timing, methods = engine.search(query="hello", top_k=3)
+
+    assert methods == ["structured", "fulltext", "vector"]
+    assert {r["id"] for r in results} == {"1", "2", "3"}
+    assert {"structured", "fulltext", "vector", "fusion", "total"} <= set(timing)
+
+
+class _ThreadRecordingEngine(_DummyEngine):
+    def __init__(self, settings: BaseAgentSettings):
+        super().__init__(settings)
+        self.threads: set[int] = set()
+
+    def _structured(self, filters, limit):
+        self.threads.add(threading.get_ident())
+        return super()._structured(filters, limit)
+
+    def _vector(self, query, filters, limit):
+        self.threads.add(threading.get_ident())
+        return super()._vector(query, filters, limit)
+
+
+def test_search_runs_methods_inline_by_default(tmp_path):
+    engine = _ThreadRecordingEngine(settings=_settings(tmp_path))
+    results, timing, methods = engine.search(query="hello", top_k=2)
+
+    assert engine.threads == {threading.get_ident()}
+    assert methods == ["structured", "vector"]
+    assert {r["id"] for r in results} == {"1", "2"}
+
+
+def test_rrf_fusion_sums_reciprocal_ranks(tmp_path):
+    engine = _DummyEngine(settings=_settings(tmp_path))
+    fused = engine.rrf_fusion(
+        [
+            [{"id": "a"}, {"id": "b"}, {"id": None}, {"id": "c"}],
+            [{"id": "c"}, {"id": "a"}],
+        ],
+        k=60,
+    )
+
+    assert [r["id"] for r in fused] == ["a", "c", "b"]
+    assert fused[0]["score"] == 1 / 61 + 1 / 62
+    assert fused[1]["score"] == 1 / 64 + 1 / 61
+    assert fused[2]["score"] == 1 / 62
+    assert engine.rrf_fusion([]) == []
+
+
+class _LimitEngine(_DummyEngine):
+    def __init__(self, settings: BaseAgentSettings):
+        super().__init__(settings)
+        self.limits: dict[str, int] = {}
+
+    def _structured(self, filters, limit):
+        self.limits["structured"] = limit
+        return []
+
+    def _fulltext(self, query, filters, limit):
+        self.limits["fulltext"] = limit
+        return []
+
+    def _vector(self, query, filters, limit):
+        self.limits["vector"] = limit
+        return []
+
+
+def test_search_per_method_limits(tmp_path):
+    engine = _LimitEngine(settings=_settings(tmp_path))
+    engine.search(query="hello", top_k=5)
+    assert engine.limits == {"structured": 10, "fulltext": 15, "vector": 15}
+
+    engine.search(query="hello", top_k=5, per_method_limits={"vector": 50})
+    assert engine.limits == {"structured": 10, "fulltext": 15, "vector": 50}
+
+
+class _FakeEmbedder:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def encode_batch(self, texts, batch_size=4):
+        assert batch_size >= len(texts)
+        self.calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class _EmbeddingEngine(_DummyEngine):
+    def __init__(self, settings: BaseAgentSettings):
+        super().__init__(settings)
+        self.embedder = _FakeEmbedder()
+
+    def _vector(self, query, filters, limit):
+        raise AssertionError("search_batch should pass the precomputed embedding")
+
+    def _vector_with_embedding(self, query, embedding, filters, limit):
+        return [({"id": int(embedding[0])}, 0.9)]
+
+
+def test_search_batch_embeds_queries_once(tmp_path):
+    engine = _EmbeddingEngine(settings=_settings(tmp_path))
+    out = engine.search_batch(["abc", "  ", "abcde"], methods=["vector"], top_k=3)
+
+    assert engine.embedder.calls == [["abc", "abcde"]]
+    assert [[r["id"] for r in results] for results, _, _ in out] == [["3"], [], ["5"]]
+    assert [methods for _, _, methods in out] == [["vector"], [], ["vector"]]
+
+
+def test_search_batch_matches_search(tmp_path):
+    engine = _DummyEngine(settings=_settings(tmp_path))
+    (batched,) = engine.search_batch(["hello"], top_k=2)
+    single = engine.search(query="hello", top_k=2)
+
+    assert [r["id"] for r in batched[0]] == [r["id"] for r in single[0]]
+    assert batched[2] == single[2]
+
+
+def test_run_timed_flags_cpu_bound_backends_in_debug(caplog, monkeypatch):
+    # Fake clocks: busy() burns 20 ms of CPU, idle() waits 20 ms without.
+    clock = {"wall": 0, "cpu": 0}
+    monkeypatch.setattr(search_module, "perf_counter_ns", lambda: clock["wall"])
+    monkeypatch.setattr(search_module, "thread_time_ns", lambda: clock["cpu"])
+
+    def busy(limit):
+        clock["wall"] += 20_000_000
+        clock["cpu"] += 20_000_000
+        return []
+
+    def idle(limit):
+        clock["wall"] += 20_000_000
+        return []
+
+    with caplog.at_level(logging.DEBUG, logger="common.search"):
+        batch, error, elapsed_ms = _run_timed(busy, 5)
+        _run_timed(idle, 5)
+
+    assert batch == [] and error is None and elapsed_ms == 20.0
+    assert "busy was CPU-bound" in caplog.text
+    assert "idle" not in caplog.text
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="common.search"):
+        _run_timed(busy, 5)
+    assert caplog.text == ""
+
+
+def test_rrf_fusion_two_group_fast_path_matches_general_path(tmp_path):
+    engine = _DummyEngine(settings=_settings(tmp_path))
+    rng = random.Random(7)
+    for n in (0, 1, 5, 40, 300):
+        a = [{"id": rng.choice([None, *range(n + 2)])} for _ in range(n)]
+        b = [{"id": rng.choice([None, *range(n + 2)])} for _ in range(n // 2 + 1)]
+        # An empty third group forces the general NumPy path.
+        assert engine.rrf_fusion([a, b]) == engine.rrf_fusion([a, b, []])
+
+
+class _PassThroughRanker:
+    def rank_results(self, results, top_k):
+        return results[:top_k]
+
+
+class _UnscoredStructuredEngine(_DummyEngine):
+    def _structured(self, filters, limit):
+        return [({"id": 1}, None)]
+
+
+def test_none_scores_still_count_as_hits(tmp_path):
+    engine = _UnscoredStructuredEngine(settings=_settings(tmp_path))
+    engine._ranker = _PassThroughRanker()
+
+    for methods in (["structured"], ["structured", "vector"]):
+        results, _, _ = engine.search(query="hello", methods=methods, top_k=5)
+        first = results[0]
+        assert first["id"] == "1"
+        assert first["scores"] == {"structured": None}
+        assert first["methods_used"] == ["structured"]